@@ -6,6 +6,8 @@ import plotly.graph_objects as go
 import pandas as pd
 import numpy as np
 import os
+import threading
+from collections import OrderedDict
 import dash_bootstrap_components as dbc
 
 # Loading the data
@@ -128,14 +130,21 @@ app = dash.Dash(__name__, external_stylesheets=[dbc.themes.BOOTSTRAP])
 server = app.server
 
 # Load the data
-try:
-    full_data, divipola_df = load_data()
-    data_loaded = True
-except Exception as e:
-    print(f"Error loading data: {e}")
+# Con SKIP_DATA_LOAD=1 no se leen los Excel (loadtest.py inyecta datos sintéticos)
+if os.environ.get('SKIP_DATA_LOAD') == '1':
+    print("Carga de datos omitida (SKIP_DATA_LOAD=1)")
     full_data = pd.DataFrame()
     divipola_df = pd.DataFrame()
     data_loaded = False
+else:
+    try:
+        full_data, divipola_df = load_data()
+        data_loaded = True
+    except Exception as e:
+        print(f"Error loading data: {e}")
+        full_data = pd.DataFrame()
+        divipola_df = pd.DataFrame()
+        data_loaded = False
 
 # Define age groups
 def categorize_age(age):
@@ -182,106 +191,404 @@ def categorize_age(age):
     except (ValueError, TypeError):
         return 'No especificado'
 
-if data_loaded and 'grupo_edad' in full_data.columns:
-    # Asegurarse de que grupo_edad sea numérico antes de aplicar la función
-    full_data['grupo_edad'] = pd.to_numeric(full_data['grupo_edad'], errors='coerce')
-    full_data['rango_edad'] = full_data['grupo_edad'].apply(categorize_age)
+# Define age order for proper display
+age_order = [
+    '0-4', '5-9', '10-14', '15-19', '20-24', '25-29', '30-34', '35-39',
+    '40-44', '45-49', '50-54', '55-59', '60-64', '65-69', '70-74',
+    '75-79', '80-84', '85+', 'No especificado'
+]
 
-# Define app layout
-app.layout = dbc.Container([
-    dbc.Row([
-        dbc.Col([
-            html.H1("Análisis de Mortalidad en Colombia 2019",
-                   className="text-center my-4"),
-            html.P("Esta aplicación muestra visualizaciones interactivas de los datos de mortalidad en Colombia durante el año 2019.",
-                   className="text-center mb-4")
-        ])
-    ]),
-    
-    dbc.Row([
-        dbc.Col([
-            html.H3('Distribución de Muertes por Departamento', 
-                    style={'textAlign': 'center', 'color': '#2980b9'}),
-            dcc.Graph(id='map-graph')
-        ], className='six columns'),
-        
-        dbc.Col([
-            html.H3('Muertes Mensuales en Colombia', 
-                    style={'textAlign': 'center', 'color': '#2980b9'}),
-            dcc.Graph(id='line-graph')
-        ], className='six columns'),
-    ], className='row'),
-    
-    dbc.Row([
-        dbc.Col([
-            html.H3('5 Ciudades más Violentas', 
-                    style={'textAlign': 'center', 'color': '#2980b9'}),
-            dcc.Graph(id='bar-violence-graph')
-        ], className='six columns'),
-        
-        dbc.Col([
-            html.H3('10 Ciudades con Menor Índice de Mortalidad', 
-                    style={'textAlign': 'center', 'color': '#2980b9'}),
-            dcc.Graph(id='pie-low-mortality-graph')
-        ], className='six columns'),
-    ], className='row'),
-    
-    dbc.Row([
-        dbc.Col([
-            html.H3('10 Principales Causas de Muerte', 
-                    style={'textAlign': 'center', 'color': '#2980b9'}),
-            dash_table.DataTable(
-                id='table-causes',
-                columns=[
-                    {'name': 'Código', 'id': 'causa_basica'},
-                    {'name': 'Causa de Muerte', 'id': 'causa_nombre'},
-                    {'name': 'Total Casos', 'id': 'total_casos'}
-                ],
-                style_table={'overflowX': 'auto'},
-                style_cell={
-                    'textAlign': 'left',
-                    'padding': '15px',
-                    'whiteSpace': 'normal',
-                    'height': 'auto',
-                },
-                style_header={
-                    'backgroundColor': '#2980b9',
-                    'color': 'white',
-                    'fontWeight': 'bold'
-                },
-                style_data_conditional=[
-                    {
-                        'if': {'row_index': 'odd'},
-                        'backgroundColor': '#f2f2f2'
-                    }
-                ]
+# Map sex codes to names
+sex_mapping = {
+    1: 'Masculino',
+    2: 'Femenino'
+}
+
+# Columnas que usan las gráficas; el resto de Anexo1 se descarta al compactar
+used_columns = [
+    'departamento', 'municipio', 'causa_basica', 'causa_nombre',
+    'año', 'mes', 'sexo', 'grupo_edad', 'rango_edad', 'sexo_nombre'
+]
+integer_columns = ['año', 'mes', 'sexo', 'grupo_edad']
+category_columns = ['departamento', 'municipio', 'causa_basica', 'causa_nombre']
+
+def downcast_integer(series):
+    # Convierte a entero con el tipo más pequeño que contenga todos los valores.
+    # Si hay nulos se usa el tipo entero nullable de pandas (Int8, Int16, ...)
+    numeric = pd.to_numeric(series, errors='coerce')
+    valid = numeric.dropna()
+    if not (valid == valid.round()).all():
+        return numeric
+    low = valid.min() if len(valid) else 0
+    high = valid.max() if len(valid) else 0
+    for dtype in (np.int8, np.int16, np.int32, np.int64):
+        info = np.iinfo(dtype)
+        if info.min <= low and high <= info.max:
+            if numeric.isna().any():
+                return numeric.astype(pd.api.types.pandas_dtype(dtype.__name__.capitalize()))
+            return numeric.astype(dtype)
+    return numeric
+
+def compact_data(df):
+    # Reduce la memoria residente de full_data: descarta columnas que ninguna
+    # gráfica usa, convierte textos repetidos en categóricos y reduce los
+    # códigos numéricos a int8/int16
+    df = df[[col for col in used_columns if col in df.columns]].copy()
+    
+    for col in integer_columns:
+        if col in df.columns:
+            df[col] = downcast_integer(df[col])
+    
+    for col in category_columns:
+        if col in df.columns:
+            df[col] = df[col].astype('category')
+    
+    if 'grupo_edad' in df.columns:
+        # Categorizar sólo los valores únicos en lugar de cada fila
+        age_labels = {age: categorize_age(age) for age in df['grupo_edad'].dropna().unique()}
+        df['rango_edad'] = pd.Categorical(
+            df['grupo_edad'].map(age_labels).fillna('No especificado'),
+            categories=age_order,
+            ordered=True
+        )
+    
+    if 'sexo' in df.columns:
+        df['sexo_nombre'] = pd.Categorical(
+            df['sexo'].map(sex_mapping).fillna('No especificado'),
+            categories=['Masculino', 'Femenino', 'No especificado']
+        )
+    
+    return df
+
+def memory_report(before, after):
+    # Tabla de memoria por columna (MB) antes y después de compactar
+    before_usage = before.memory_usage(index=False, deep=True) / 1024 ** 2
+    after_usage = after.memory_usage(index=False, deep=True) / 1024 ** 2
+    report = pd.DataFrame({
+        'dtype': after.dtypes.astype(str),
+        'antes_mb': before_usage,
+        'despues_mb': after_usage,
+    })
+    report['dtype'] = report['dtype'].fillna('(descartada)')
+    report = report.fillna(0).sort_values('antes_mb', ascending=False)
+    
+    total_before = before_usage.sum()
+    total_after = after_usage.sum()
+    ratio = total_before / total_after if total_after else float('inf')
+    
+    lines = [
+        "\nUso de memoria por columna:",
+        report.to_string(float_format=lambda value: f"{value:.2f}"),
+        f"Total: {total_before:.2f} MB -> {total_after:.2f} MB (reducción {ratio:.1f}x)"
+    ]
+    return "\n".join(lines)
+
+if data_loaded:
+    raw_data = full_data
+    full_data = compact_data(raw_data)
+    print(memory_report(raw_data, full_data))
+    del raw_data
+
+# Map month numbers to names
+month_names = {
+    1: 'Enero', 2: 'Febrero', 3: 'Marzo', 4: 'Abril',
+    5: 'Mayo', 6: 'Junio', 7: 'Julio', 8: 'Agosto',
+    9: 'Septiembre', 10: 'Octubre', 11: 'Noviembre', 12: 'Diciembre'
+}
+
+# Dimensiones disponibles en el modo comparación
+comparison_dimensions = [
+    {'label': 'Departamento', 'value': 'departamento'},
+    {'label': 'Sexo', 'value': 'sexo_nombre'},
+    {'label': 'Año', 'value': 'año'},
+]
+
+# Caché de conteos por (dimensión, valor, columna). full_data no cambia después
+# de cargarse, así que un lado de la comparación que no cambia se reutiliza
+aggregate_cache = OrderedDict()
+aggregate_cache_lock = threading.Lock()
+aggregate_cache_size = 256
+
+def slice_counts(dimension, values, key):
+    # Conteos por `key` para cada valor de `dimension`. Los valores que no están
+    # en caché se calculan juntos en una sola agrupación por (slice, key)
+    counts = {}
+    with aggregate_cache_lock:
+        for value in values:
+            cache_key = (dimension, value, key)
+            if cache_key in aggregate_cache:
+                aggregate_cache.move_to_end(cache_key)
+                counts[value] = aggregate_cache[cache_key]
+    
+    missing = [value for value in dict.fromkeys(values) if value not in counts]
+    if missing:
+        mask = full_data[dimension].isin(missing)
+        slice_label = full_data.loc[mask, dimension].rename('slice')
+        key_values = full_data.loc[mask, key]
+        grouped = key_values.groupby([slice_label, key_values], observed=True).size()
+        by_slice = grouped.unstack('slice', fill_value=0)
+        
+        with aggregate_cache_lock:
+            for value in missing:
+                if value in by_slice.columns:
+                    counts[value] = by_slice[value][by_slice[value] > 0]
+                else:
+                    counts[value] = pd.Series(dtype='int64')
+                aggregate_cache[(dimension, value, key)] = counts[value]
+            while len(aggregate_cache) > aggregate_cache_size:
+                aggregate_cache.popitem(last=False)
+    
+    return [counts[value] for value in values]
+
+cause_names_lookup = None
+
+def cause_names():
+    # Correspondencia causa_basica -> causa_nombre, calculada una sola vez
+    global cause_names_lookup
+    with aggregate_cache_lock:
+        if cause_names_lookup is None:
+            causa_nombres = full_data.dropna(subset=['causa_basica', 'causa_nombre'])[['causa_basica', 'causa_nombre']]
+            causa_nombres = causa_nombres.astype(str).drop_duplicates('causa_basica')
+            cause_names_lookup = causa_nombres.set_index('causa_basica')['causa_nombre']
+        return cause_names_lookup
+
+comparison_options_cache = {}
+
+def comparison_options(dimension):
+    # Opciones y grupos por defecto de una dimensión, calculados una sola vez
+    if not data_loaded or dimension not in full_data.columns:
+        return [], None, None
+    with aggregate_cache_lock:
+        if dimension not in comparison_options_cache:
+            counts = full_data[dimension].value_counts()
+            counts = counts[counts > 0]
+            # De mayor a menor número de muertes; los años en orden cronológico
+            values = sorted(counts.index.tolist()) if dimension == 'año' else counts.index.tolist()
+            values = [value.item() if hasattr(value, 'item') else value for value in values]
+            options = [{'label': str(value), 'value': value} for value in values]
+            
+            # Por defecto: los dos departamentos con más muertes, Masculino vs Femenino, último año vs anterior
+            if not values:
+                value_a = value_b = None
+            elif dimension == 'año':
+                value_a, value_b = values[-1], values[-2] if len(values) > 1 else values[-1]
+            else:
+                value_a, value_b = values[0], values[1] if len(values) > 1 else values[0]
+            comparison_options_cache[dimension] = (options, value_a, value_b)
+        return comparison_options_cache[dimension]
+
+def comparison_unchanged(mode):
+    # True cuando el modo comparación está apagado y sólo cambió un selector de
+    # la comparación: la gráfica normal no cambia, así que no se recalcula
+    triggered = {prop_id.split('.')[0] for prop_id in dash.ctx.triggered_prop_ids}
+    return (
+        not (mode and 'comparar' in mode)
+        and bool(triggered)
+        and triggered <= {'compare-dimension', 'compare-a', 'compare-b'}
+    )
+
+unspecified_age_visible = None
+
+def show_unspecified_age():
+    # 'No especificado' se muestra sólo si supera el 5% del rango de edad más
+    # frecuente en todos los datos; así ambos modos muestran los mismos rangos
+    global unspecified_age_visible
+    with aggregate_cache_lock:
+        if unspecified_age_visible is None:
+            counts = full_data.groupby('rango_edad', observed=True).size()
+            unspecified_age_visible = bool(
+                'No especificado' in counts.index
+                and counts['No especificado'] >= counts.max() * 0.05
             )
-        ], width=12),
-    ]),
-    
-    dbc.Row([
-        dbc.Col([
-            html.H3('Distribución de Muertes por Edad', 
-                    style={'textAlign': 'center', 'color': '#2980b9'}),
-            dcc.Graph(id='histogram-age-graph')
-        ], width=12),
-    ]),
-    
-    dbc.Row([
-        dbc.Col([
-            html.H3('Muertes por Sexo y Departamento', 
-                    style={'textAlign': 'center', 'color': '#2980b9'}),
-            dcc.Graph(id='stacked-bar-graph')
-        ], width=12),
-    ]),
-    
-    dbc.Row([
-        dbc.Col([
-            html.P('Desarrollado para el curso de Aplicaciones I - Universidad de La Salle © 2025',
-                  style={'textAlign': 'center', 'marginTop': 30})
+        return unspecified_age_visible
+
+def slice_name(side, value):
+    return f"{side}: {value}"
+
+def compare_slices(dimension, value_a, value_b, key):
+    # Devuelve un dataframe con los conteos de ambos lados y su diferencia (A - B)
+    counts_a, counts_b = slice_counts(dimension, [value_a, value_b], key)
+    name_a, name_b = slice_name('A', value_a), slice_name('B', value_b)
+    compare = pd.concat([counts_a.rename(name_a), counts_b.rename(name_b)], axis=1).fillna(0).astype(int)
+    compare.index.name = key
+    compare['diferencia'] = compare[name_a] - compare[name_b]
+    return compare.reset_index(), name_a, name_b
+
+def comparison_active(mode, dimension, value_a, value_b):
+    return (
+        bool(mode) and 'comparar' in mode
+        and dimension in full_data.columns
+        and value_a is not None and value_b is not None
+    )
+
+def comparison_figure(compare, x, name_a, name_b, title, x_title, height, slices_as='bar'):
+    # Ambos lados como barras (o líneas) y la diferencia A - B como línea punteada
+    fig = go.Figure()
+    for name, color in ((name_a, '#2980b9'), (name_b, '#e67e22')):
+        if slices_as == 'line':
+            fig.add_trace(go.Scatter(x=compare[x], y=compare[name], name=name, mode='lines+markers', line={'color': color}))
+        else:
+            fig.add_trace(go.Bar(x=compare[x], y=compare[name], name=name, marker_color=color))
+    fig.add_trace(go.Scatter(
+        x=compare[x], y=compare['diferencia'], name='Diferencia (A - B)',
+        mode='lines+markers', line={'color': '#7f8c8d', 'dash': 'dot'}
+    ))
+    
+    fig.update_layout(
+        title=title,
+        height=height,
+        xaxis_title=x_title,
+        yaxis_title='Total Muertes',
+        barmode='group',
+        hovermode='x unified',
+        legend_title='Grupo'
+    )
+    return fig
+
+# Columnas de la tabla de causas fuera del modo comparación
+causes_columns = [
+    {'name': 'Código', 'id': 'causa_basica'},
+    {'name': 'Causa de Muerte', 'id': 'causa_nombre'},
+    {'name': 'Total Casos', 'id': 'total_casos'}
+]
+
+# Define app layout
+def serve_layout():
+    # Se arma en cada carga de página para usar las opciones de comparación ya calculadas
+    options, value_a, value_b = comparison_options('departamento')
+    
+    return dbc.Container([
+        dbc.Row([
+            dbc.Col([
+                html.H1("Análisis de Mortalidad en Colombia 2019",
+                       className="text-center my-4"),
+                html.P("Esta aplicación muestra visualizaciones interactivas de los datos de mortalidad en Colombia durante el año 2019.",
+                       className="text-center mb-4")
+            ])
+        ]),
+    
+        dbc.Row([
+            dbc.Col([
+                dcc.Checklist(
+                    id='compare-mode',
+                    options=[{'label': ' Modo comparación', 'value': 'comparar'}],
+                    value=[]
+                )
+            ], md=3),
+        
+            dbc.Col([
+                html.Label('Comparar por'),
+                dcc.Dropdown(id='compare-dimension', options=comparison_dimensions,
+                             value='departamento', clearable=False)
+            ], md=3),
+        
+            dbc.Col([
+                html.Label('Grupo A'),
+                dcc.Dropdown(id='compare-a', options=options, value=value_a)
+            ], md=3),
+        
+            dbc.Col([
+                html.Label('Grupo B'),
+                dcc.Dropdown(id='compare-b', options=options, value=value_b)
+            ], md=3),
+        ], className='mb-4'),
+    
+        dbc.Row([
+            dbc.Col([
+                html.H3('Distribución de Muertes por Departamento', 
+                        style={'textAlign': 'center', 'color': '#2980b9'}),
+                dcc.Graph(id='map-graph')
+            ], className='six columns'),
+        
+            dbc.Col([
+                html.H3('Muertes Mensuales en Colombia', 
+                        style={'textAlign': 'center', 'color': '#2980b9'}),
+                dcc.Graph(id='line-graph')
+            ], className='six columns'),
+        ], className='row'),
+    
+        dbc.Row([
+            dbc.Col([
+                html.H3('5 Ciudades más Violentas', 
+                        style={'textAlign': 'center', 'color': '#2980b9'}),
+                dcc.Graph(id='bar-violence-graph')
+            ], className='six columns'),
+        
+            dbc.Col([
+                html.H3('10 Ciudades con Menor Índice de Mortalidad', 
+                        style={'textAlign': 'center', 'color': '#2980b9'}),
+                dcc.Graph(id='pie-low-mortality-graph')
+            ], className='six columns'),
+        ], className='row'),
+    
+        dbc.Row([
+            dbc.Col([
+                html.H3('10 Principales Causas de Muerte', 
+                        style={'textAlign': 'center', 'color': '#2980b9'}),
+                dash_table.DataTable(
+                    id='table-causes',
+                    columns=causes_columns,
+                    style_table={'overflowX': 'auto'},
+                    style_cell={
+                        'textAlign': 'left',
+                        'padding': '15px',
+                        'whiteSpace': 'normal',
+                        'height': 'auto',
+                    },
+                    style_header={
+                        'backgroundColor': '#2980b9',
+                        'color': 'white',
+                        'fontWeight': 'bold'
+                    },
+                    style_data_conditional=[
+                        {
+                            'if': {'row_index': 'odd'},
+                            'backgroundColor': '#f2f2f2'
+                        }
+                    ]
+                )
+            ], width=12),
+        ]),
+    
+        dbc.Row([
+            dbc.Col([
+                html.H3('Distribución de Muertes por Edad', 
+                        style={'textAlign': 'center', 'color': '#2980b9'}),
+                dcc.Graph(id='histogram-age-graph')
+            ], width=12),
+        ]),
+    
+        dbc.Row([
+            dbc.Col([
+                html.H3('Muertes por Sexo y Departamento', 
+                        style={'textAlign': 'center', 'color': '#2980b9'}),
+                dcc.Graph(id='stacked-bar-graph')
+            ], width=12),
+        ]),
+    
+        dbc.Row([
+            dbc.Col([
+                html.P('Desarrollado para el curso de Aplicaciones I - Universidad de La Salle © 2025',
+                      style={'textAlign': 'center', 'marginTop': 30})
+            ])
         ])
-    ])
-], fluid=True)
+    ], fluid=True)
+
+app.layout = serve_layout
+
+# Define callback for comparison group options
+@app.callback(
+    [Output('compare-a', 'options'),
+     Output('compare-b', 'options'),
+     Output('compare-a', 'value'),
+     Output('compare-b', 'value')],
+    [Input('compare-dimension', 'value')],
+    prevent_initial_call=True
+)
+def update_comparison_options(dimension):
+    # Las opciones iniciales vienen en el layout; sólo se actualizan al cambiar la dimensión
+    options, value_a, value_b = comparison_options(dimension)
+    return options, options, value_a, value_b
 
 # Define callback for map
 @app.callback(
@@ -293,7 +600,7 @@ def update_map(id):
         return go.Figure().update_layout(title="No se pudieron cargar los datos")
     
     # Calculate deaths by department
-    deaths_by_dept = full_data.groupby('departamento').size().reset_index(name='total_muertes')
+    deaths_by_dept = full_data.groupby('departamento', observed=True).size().reset_index(name='total_muertes')
     
     # Colombia GeoJSON puede ser cargado de un repositorio público o incluido directamente
     # Por simplicidad, usaremos px.choropleth_mapbox que no requiere GeoJSON
@@ -400,23 +707,30 @@ def update_map(id):
 # Define callback for line graph
 @app.callback(
     Output('line-graph', 'figure'),
-    [Input('line-graph', 'id')]
+    [Input('line-graph', 'id'),
+     Input('compare-mode', 'value'),
+     Input('compare-dimension', 'value'),
+     Input('compare-a', 'value'),
+     Input('compare-b', 'value')]
 )
-def update_line_graph(id):
+def update_line_graph(id, mode, dimension, value_a, value_b):
+    if comparison_unchanged(mode):
+        return dash.no_update
+    
     if not data_loaded:
         return go.Figure().update_layout(title="No se pudieron cargar los datos mensuales")
     
+    if 'mes' in full_data.columns and comparison_active(mode, dimension, value_a, value_b):
+        compare, name_a, name_b = compare_slices(dimension, value_a, value_b, 'mes')
+        compare = compare.sort_values('mes')
+        compare['mes_nombre'] = compare['mes'].map(month_names)
+        return comparison_figure(compare, 'mes_nombre', name_a, name_b,
+                                 'Muertes por Mes: Comparación', 'Mes', 500, slices_as='line')
+    
     # Calculate deaths by month
     if 'mes' in full_data.columns:
-        deaths_by_month = full_data.groupby('mes').size().reset_index(name='total_muertes')
+        deaths_by_month = full_data.groupby('mes', observed=True).size().reset_index(name='total_muertes')
         deaths_by_month = deaths_by_month.sort_values('mes')
-        
-        # Map month numbers to names
-        month_names = {
-            1: 'Enero', 2: 'Febrero', 3: 'Marzo', 4: 'Abril', 
-            5: 'Mayo', 6: 'Junio', 7: 'Julio', 8: 'Agosto',
-            9: 'Septiembre', 10: 'Octubre', 11: 'Noviembre', 12: 'Diciembre'
-        }
         deaths_by_month['mes_nombre'] = deaths_by_month['mes'].map(month_names)
         
         # Create line chart
@@ -454,12 +768,10 @@ def update_violence_graph(id):
     
     try:
         # Filter homicides (agresión con disparo de armas de fuego - X95 o códigos similares)
-        # Asegurarse de que causa_basica sea string antes de aplicar str.contains
-        full_data['causa_basica'] = full_data['causa_basica'].astype(str)
         homicides = full_data[full_data['causa_basica'].str.contains('X95|X93|X94|X99', na=False, regex=True)]
         
         # Calculate homicides by city
-        homicides_by_city = homicides.groupby('municipio').size().reset_index(name='total_homicidios')
+        homicides_by_city = homicides.groupby('municipio', observed=True).size().reset_index(name='total_homicidios')
         homicides_by_city = homicides_by_city.sort_values('total_homicidios', ascending=False).head(5)
         
         # Create bar chart
@@ -499,7 +811,7 @@ def update_low_mortality_graph(id):
     
     try:
         # Calculate deaths by city (excluding cities with very few cases)
-        deaths_by_city = full_data.groupby('municipio').size().reset_index(name='total_muertes')
+        deaths_by_city = full_data.groupby('municipio', observed=True).size().reset_index(name='total_muertes')
         # Filtrar para tener sólo municipios con nombre válido
         deaths_by_city = deaths_by_city[deaths_by_city['municipio'].notna() & (deaths_by_city['municipio'] != '')]
         deaths_by_city = deaths_by_city[deaths_by_city['total_muertes'] > 50]  # Aumentar el umbral mínimo
@@ -532,20 +844,47 @@ def update_low_mortality_graph(id):
 
 # Define callback for main causes table
 @app.callback(
-    Output('table-causes', 'data'),
-    [Input('table-causes', 'id')]
+    [Output('table-causes', 'data'),
+     Output('table-causes', 'columns')],
+    [Input('table-causes', 'id'),
+     Input('compare-mode', 'value'),
+     Input('compare-dimension', 'value'),
+     Input('compare-a', 'value'),
+     Input('compare-b', 'value')]
 )
-def update_causes_table(id):
+def update_causes_table(id, mode, dimension, value_a, value_b):
+    if comparison_unchanged(mode):
+        return dash.no_update, dash.no_update
+    
     if not data_loaded:
-        return []
+        return [], causes_columns
     
     try:
+        if comparison_active(mode, dimension, value_a, value_b):
+            compare, name_a, name_b = compare_slices(dimension, value_a, value_b, 'causa_basica')
+            
+            # Top 10 por el total de ambos grupos
+            compare['total'] = compare[name_a] + compare[name_b]
+            compare = compare.sort_values('total', ascending=False).head(10)
+            
+            compare['causa_basica'] = compare['causa_basica'].astype(str)
+            compare['causa_nombre'] = compare['causa_basica'].map(cause_names()).fillna('No especificado')
+            
+            columns = [
+                {'name': 'Código', 'id': 'causa_basica'},
+                {'name': 'Causa de Muerte', 'id': 'causa_nombre'},
+                {'name': name_a, 'id': name_a},
+                {'name': name_b, 'id': name_b},
+                {'name': 'Diferencia (A - B)', 'id': 'diferencia'}
+            ]
+            return compare[[column['id'] for column in columns]].to_dict('records'), columns
+        
         # Calculate deaths by cause
         # Agrupar por causa_basica primero y luego realizar un join con un dataframe
         # que tiene la correspondencia única entre causa_basica y causa_nombre
         
         # 1. Contar muertes por causa_basica
-        deaths_by_causa = full_data.groupby('causa_basica').size().reset_index(name='total_casos')
+        deaths_by_causa = full_data.groupby('causa_basica', observed=True).size().reset_index(name='total_casos')
         
         # 2. Crear un dataframe con la correspondencia única causa_basica -> causa_nombre
         causa_nombres = full_data.dropna(subset=['causa_basica', 'causa_nombre'])[['causa_basica', 'causa_nombre']].drop_duplicates()
@@ -562,39 +901,43 @@ def update_causes_table(id):
         causes = causes.sort_values('total_casos', ascending=False).head(10)
         
         # 5. Limpiar nombres de causas
-        causes['causa_nombre'] = causes['causa_nombre'].fillna('No especificado')
+        causes['causa_basica'] = causes['causa_basica'].astype(str)
+        causes['causa_nombre'] = causes['causa_nombre'].astype(object).fillna('No especificado')
         
-        return causes.to_dict('records')
+        return causes.to_dict('records'), causes_columns
     except Exception as e:
         print(f"Error generating causes table: {e}")
-        return []
+        return [], causes_columns
 
 # Define callback for age distribution histogram
 @app.callback(
     Output('histogram-age-graph', 'figure'),
-    [Input('histogram-age-graph', 'id')]
+    [Input('histogram-age-graph', 'id'),
+     Input('compare-mode', 'value'),
+     Input('compare-dimension', 'value'),
+     Input('compare-a', 'value'),
+     Input('compare-b', 'value')]
 )
-def update_age_histogram(id):
+def update_age_histogram(id, mode, dimension, value_a, value_b):
+    if comparison_unchanged(mode):
+        return dash.no_update
+    
     if not data_loaded:
         return go.Figure().update_layout(title="No se pudieron cargar los datos de edad")
     
     try:
-        # Verificar si ya tenemos la columna rango_edad
-        if 'rango_edad' not in full_data.columns:
-            # Convertir grupo_edad a numérico si no lo es
-            full_data['grupo_edad'] = pd.to_numeric(full_data['grupo_edad'], errors='coerce')
-            # Aplicar la función de categorización
-            full_data['rango_edad'] = full_data['grupo_edad'].apply(categorize_age)
+        if 'rango_edad' in full_data.columns and comparison_active(mode, dimension, value_a, value_b):
+            compare, name_a, name_b = compare_slices(dimension, value_a, value_b, 'rango_edad')
+            compare['rango_edad'] = pd.Categorical(compare['rango_edad'], categories=age_order, ordered=True)
+            compare = compare.sort_values('rango_edad')
+            if not show_unspecified_age():
+                compare = compare[compare['rango_edad'] != 'No especificado']
+            compare['rango_edad'] = compare['rango_edad'].astype(str)
+            return comparison_figure(compare, 'rango_edad', name_a, name_b,
+                                     'Distribución de Muertes por Edad: Comparación', 'Rango de Edad', 500)
         
         # Calculate deaths by age group
-        deaths_by_age = full_data.groupby('rango_edad').size().reset_index(name='total_muertes')
-        
-        # Define age order for proper display
-        age_order = [
-            '0-4', '5-9', '10-14', '15-19', '20-24', '25-29', '30-34', '35-39',
-            '40-44', '45-49', '50-54', '55-59', '60-64', '65-69', '70-74',
-            '75-79', '80-84', '85+', 'No especificado'
-        ]
+        deaths_by_age = full_data.groupby('rango_edad', observed=True).size().reset_index(name='total_muertes')
         
         # Sort by defined order
         deaths_by_age['rango_edad'] = pd.Categorical(
@@ -605,10 +948,8 @@ def update_age_histogram(id):
         deaths_by_age = deaths_by_age.sort_values('rango_edad')
         
         # Eliminar 'No especificado' si no queremos mostrarlo
-        if 'No especificado' in deaths_by_age['rango_edad'].values:
-            no_spec_data = deaths_by_age[deaths_by_age['rango_edad'] == 'No especificado']
-            if not no_spec_data.empty and no_spec_data['total_muertes'].iloc[0] < deaths_by_age['total_muertes'].max() * 0.05:
-                deaths_by_age = deaths_by_age[deaths_by_age['rango_edad'] != 'No especificado']
+        if not show_unspecified_age():
+            deaths_by_age = deaths_by_age[deaths_by_age['rango_edad'] != 'No especificado']
         
         # Create histogram
         fig = px.bar(
@@ -639,36 +980,50 @@ def update_age_histogram(id):
 # Define callback for stacked bar chart (deaths by gender and department)
 @app.callback(
     Output('stacked-bar-graph', 'figure'),
-    [Input('stacked-bar-graph', 'id')]
+    [Input('stacked-bar-graph', 'id'),
+     Input('compare-mode', 'value'),
+     Input('compare-dimension', 'value'),
+     Input('compare-a', 'value'),
+     Input('compare-b', 'value')]
 )
-def update_stacked_bar_graph(id):
+def update_stacked_bar_graph(id, mode, dimension, value_a, value_b):
+    if comparison_unchanged(mode):
+        return dash.no_update
+    
     if not data_loaded:
         return go.Figure().update_layout(title="No se pudieron cargar los datos de género")
     
     try:
-        # Map sex codes to names
-        sex_mapping = {
-            1: 'Masculino',
-            2: 'Femenino'
-        }
-        
-        # Asegurarse de que el sexo sea numérico
-        full_data['sexo'] = pd.to_numeric(full_data['sexo'], errors='coerce')
-        full_data['sexo_nombre'] = full_data['sexo'].map(sex_mapping)
-        
-        # Manejar valores nulos o desconocidos
-        full_data['sexo_nombre'] = full_data['sexo_nombre'].fillna('No especificado')
+        if comparison_active(mode, dimension, value_a, value_b):
+            if dimension == 'departamento':
+                # Cada departamento sólo tiene su propia barra; se desglosa por sexo
+                compare, name_a, name_b = compare_slices(dimension, value_a, value_b, 'sexo_nombre')
+                compare['sexo_nombre'] = compare['sexo_nombre'].astype(str)
+                return comparison_figure(compare, 'sexo_nombre', name_a, name_b,
+                                         'Muertes por Sexo: Comparación', 'Sexo', 600)
+            
+            compare, name_a, name_b = compare_slices(dimension, value_a, value_b, 'departamento')
+            
+            # Top 15 departamentos por el total de ambos grupos
+            compare['departamento'] = compare['departamento'].astype(str)
+            compare['total'] = compare[name_a] + compare[name_b]
+            compare = compare[compare['departamento'] != ''].nlargest(15, 'total')
+            return comparison_figure(compare, 'departamento', name_a, name_b,
+                                     'Muertes por Departamento: Comparación', 'Departamento', 600)
         
         # Calculate deaths by department and sex
-        deaths_by_dept_sex = full_data.groupby(['departamento', 'sexo_nombre']).size().reset_index(name='total_muertes')
+        deaths_by_dept_sex = full_data.groupby(['departamento', 'sexo_nombre'], observed=True).size().reset_index(name='total_muertes')
         
         # Eliminar departamentos sin nombre (si existen)
         deaths_by_dept_sex = deaths_by_dept_sex[deaths_by_dept_sex['departamento'].notna() & (deaths_by_dept_sex['departamento'] != '')]
         
         # Obtener top 15 departamentos por total de muertes para evitar gráfico sobrecargado
-        top_depts = deaths_by_dept_sex.groupby('departamento')['total_muertes'].sum().nlargest(15).index.tolist()
+        top_depts = deaths_by_dept_sex.groupby('departamento', observed=True)['total_muertes'].sum().nlargest(15).index.tolist()
         deaths_by_dept_sex = deaths_by_dept_sex[deaths_by_dept_sex['departamento'].isin(top_depts)]
         
+        # Plotly agrupa por el color; se pasan etiquetas como texto y no como categóricos
+        deaths_by_dept_sex = deaths_by_dept_sex.astype({'departamento': str, 'sexo_nombre': str})
+        
         # Create stacked bar chart
         fig = px.bar(
             deaths_by_dept_sex,
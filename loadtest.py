@@ -0,0 +1,398 @@
+# loadtest.py
+# Generador de carga para los callbacks de Dash.
+#
+# Levanta la aplicación con gunicorn (mismo gunicorn.conf.py que en Render)
+# sobre datos sintéticos y reproduce la secuencia real de carga de la página:
+# GET /, /_dash-layout, /_dash-dependencies y un POST a /_dash-update-component
+# por cada callback. Reporta throughput, latencias p50/p95/p99 y tasa de error
+# por callback para ajustar workers/threads con datos.
+#
+# Uso:
+#   python loadtest.py --users 16 --duration 30 --workers 1 --threads 8
+#   python loadtest.py --url http://localhost:10000 --users 8   # servidor ya iniciado
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+# Departamentos con coordenadas en el mapa, para que el callback del mapa trabaje completo
+departments = [
+    'ANTIOQUIA', 'ATLANTICO', 'BOGOTA', 'BOLIVAR', 'BOYACA', 'CALDAS', 'CAQUETA',
+    'CAUCA', 'CESAR', 'CORDOBA', 'CUNDINAMARCA', 'CHOCO', 'HUILA', 'LA GUAJIRA',
+    'MAGDALENA', 'META', 'NARIÑO', 'NORTE DE SANTANDER', 'QUINDIO', 'RISARALDA',
+    'SANTANDER', 'SUCRE', 'TOLIMA', 'VALLE DEL CAUCA', 'ARAUCA', 'CASANARE',
+    'PUTUMAYO', 'SAN ANDRES', 'AMAZONAS', 'GUAINIA', 'GUAVIARE', 'VAUPES', 'VICHADA',
+]
+
+# Create synthetic data with the same shape as the output of load_data()
+def synthetic_data(rows, seed=0):
+    rng = np.random.default_rng(seed)
+
+    # Códigos CIE-10 con prefijos de homicidio (X93-X99) y causas comunes
+    causes = [f'{prefix}{number:02d}{sub}' for prefix, numbers in (('X', range(90, 100)), ('I', range(10, 70)), ('J', range(10, 50)))
+              for number in numbers for sub in range(10)]
+    cause_names = {code: f'Descripción de la causa de muerte {code}, texto completo del Anexo2' for code in causes}
+
+    # Municipios con frecuencias desiguales, como en los datos reales
+    municipalities = [(dept_index, muni) for dept_index in range(len(departments)) for muni in range(1, 31)]
+    muni_weights = rng.pareto(1.5, len(municipalities)) + 1
+    muni_index = rng.choice(len(municipalities), rows, p=muni_weights / muni_weights.sum())
+    dept_index = np.array([municipalities[i][0] for i in muni_index])
+    muni_code = np.array([municipalities[i][1] for i in muni_index])
+
+    cause_weights = rng.pareto(1.2, len(causes)) + 1
+    cause = np.array(causes, dtype=object)[rng.choice(len(causes), rows, p=cause_weights / cause_weights.sum())]
+
+    months = rng.integers(1, 13, rows)
+    days = rng.integers(1, 29, rows)
+
+    return pd.DataFrame({
+        'cod_depto': (dept_index + 5).astype(str),
+        'cod_muni': ((dept_index + 5) * 1000 + muni_code).astype(str),
+        'año': 2019,
+        'mes': months,
+        'fecha_defuncion': pd.to_datetime({'year': 2019, 'month': months, 'day': days}),
+        'sexo': rng.choice([1, 2, 3], rows, p=[0.55, 0.44, 0.01]),
+        'grupo_edad': rng.integers(0, 100, rows).astype(float),
+        'estado_civil': rng.integers(1, 7, rows),
+        'nivel_edu': rng.integers(1, 14, rows),
+        'departamento': np.array(departments, dtype=object)[dept_index],
+        'municipio': np.array([f'{departments[d]} MUNICIPIO {m}' for d, m in zip(dept_index, muni_code)], dtype=object),
+        'causa_basica': cause,
+        'causa_nombre': pd.Series(cause).map(cause_names).values,
+    })
+
+# App factory for gunicorn: gunicorn 'loadtest:create_server()'
+def create_server():
+    # Evita que app lea los Excel reales antes de reemplazar los datos
+    os.environ['SKIP_DATA_LOAD'] = '1'
+    import app
+
+    rows = int(os.environ.get('LOADTEST_ROWS', 250000))
+    print(f"Generando {rows} filas sintéticas...")
+    raw_data = synthetic_data(rows)
+    app.full_data = app.compact_data(raw_data)
+    app.data_loaded = True
+    print(app.memory_report(raw_data, app.full_data))
+
+    return app.server
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+def start_server(args):
+    port = free_port()
+    env = dict(os.environ, LOADTEST_ROWS=str(args.rows), SKIP_DATA_LOAD='1')
+    command = [
+        sys.executable, '-m', 'gunicorn',
+        '-c', 'gunicorn.conf.py',
+        '--bind', f'127.0.0.1:{port}',
+        '--workers', str(args.workers),
+        '--threads', str(args.threads),
+        'loadtest:create_server()',
+    ]
+    print("Iniciando servidor:", ' '.join(command))
+    process = subprocess.Popen(command, env=env, cwd=os.path.dirname(os.path.abspath(__file__)))
+    url = f'http://127.0.0.1:{port}'
+
+    # Esperar a que el servidor responda
+    deadline = time.time() + args.startup_timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"El servidor terminó con código {process.returncode}")
+        try:
+            urllib.request.urlopen(url + '/', timeout=2).read()
+            return process, url
+        except (urllib.error.URLError, ConnectionError, socket.timeout):
+            time.sleep(0.5)
+    process.terminate()
+    raise RuntimeError("El servidor no respondió a tiempo")
+
+def request(url, payload=None, timeout=60):
+    data = None
+    headers = {}
+    if payload is not None:
+        data = json.dumps(payload).encode('utf-8')
+        headers['Content-Type'] = 'application/json'
+    req = urllib.request.Request(url, data=data, headers=headers)
+    with urllib.request.urlopen(req, timeout=timeout) as response:
+        return response.read()
+
+def find_props(layout, props_by_id):
+    # Recorre el layout y guarda las props de cada componente con id
+    if isinstance(layout, list):
+        for child in layout:
+            find_props(child, props_by_id)
+    elif isinstance(layout, dict):
+        props = layout.get('props', {})
+        if 'id' in props:
+            props_by_id[prop_key(props['id'])] = props
+        find_props(props.get('children'), props_by_id)
+
+def parse_output(output):
+    # "graph.figure" o, para múltiples salidas, "..a.figure...b.data.."
+    if output.startswith('..'):
+        return [parse_output(item) for item in output[2:-2].split('...')]
+    component_id, prop = output.rsplit('.', 1)
+    if component_id.startswith('{'):
+        component_id = json.loads(component_id)
+    return {'id': component_id, 'property': prop}
+
+def prop_key(component_id):
+    # Clave común para ids del layout y de las respuestas de los callbacks
+    if isinstance(component_id, str) and component_id.startswith('{'):
+        component_id = json.loads(component_id)
+    return json.dumps(component_id, sort_keys=True)
+
+# Read layout and dependencies and group the callbacks in waves, as the Dash
+# renderer does on page load: a callback is sent only after the callbacks
+# that produce its inputs have answered
+def load_callbacks(url):
+    layout = json.loads(request(url + '/_dash-layout'))
+    dependencies = json.loads(request(url + '/_dash-dependencies'))
+
+    props_by_id = {}
+    find_props(layout, props_by_id)
+
+    callbacks = []
+    for dependency in dependencies:
+        if dependency.get('prevent_initial_call'):
+            continue
+        outputs = parse_output(dependency['output'])
+        outputs_list = outputs if isinstance(outputs, list) else [outputs]
+        first_id = outputs_list[0]['id']
+        callbacks.append({
+            'name': first_id if isinstance(first_id, str) else json.dumps(first_id),
+            'output': dependency['output'],
+            'outputs': outputs,
+            'produces': {(prop_key(item['id']), item['property']) for item in outputs_list},
+            'inputs': dependency['inputs'],
+            'state': dependency.get('state', []),
+        })
+
+    waves = []
+    pending = callbacks
+    while pending:
+        produced = set().union(*(callback['produces'] for callback in pending))
+        wave = [
+            callback for callback in pending
+            if not any((prop_key(item['id']), item['property']) in produced - callback['produces']
+                       for item in callback['inputs'] + callback['state'])
+        ]
+        if not wave:
+            # Dependencia circular: enviar el resto juntos
+            wave = pending
+        waves.append(wave)
+        pending = [callback for callback in pending if callback not in wave]
+    return props_by_id, waves
+
+def build_payload(callback, props_by_id):
+    def with_value(dependency):
+        props = props_by_id.get(prop_key(dependency['id']), {})
+        item = {'id': dependency['id'], 'property': dependency['property']}
+        if dependency['property'] in props:
+            item['value'] = props[dependency['property']]
+        return item
+
+    return {
+        'output': callback['output'],
+        'outputs': callback['outputs'],
+        'inputs': [with_value(item) for item in callback['inputs']],
+        'state': [with_value(item) for item in callback['state']],
+        'changedPropIds': [],
+    }
+
+def apply_response(body, props_by_id):
+    # Guarda los valores devueltos por un callback para las siguientes oleadas
+    if not body:
+        return
+    for component_id, props in json.loads(body).get('response', {}).items():
+        props_by_id.setdefault(prop_key(component_id), {}).update(props)
+
+def error_reason(error):
+    # Estado HTTP o tipo de excepción, para agrupar los errores en el reporte
+    if isinstance(error, urllib.error.HTTPError):
+        return f'HTTP {error.code}'
+    if isinstance(error, urllib.error.URLError) and isinstance(error.reason, Exception):
+        return type(error.reason).__name__
+    return type(error).__name__
+
+class Results:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.errors = defaultdict(int)
+        self.reasons = defaultdict(Counter)
+
+    def timed(self, name, func, *args):
+        # Devuelve el resultado de func, o None si falló
+        start = time.perf_counter()
+        reason = None
+        try:
+            result = func(*args)
+        except Exception as error:
+            result = None
+            reason = error_reason(error)
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            if reason is None:
+                self.latencies[name].append(elapsed)
+            else:
+                self.errors[name] += 1
+                self.reasons[name][reason] += 1
+        return result
+
+    def state(self):
+        # Versión serializable para devolverla desde un proceso cliente
+        return dict(self.latencies), dict(self.errors), {name: dict(reasons) for name, reasons in self.reasons.items()}
+
+    def merge(self, state):
+        latencies, errors, reasons = state
+        for name, values in latencies.items():
+            self.latencies[name].extend(values)
+        for name, count in errors.items():
+            self.errors[name] += count
+        for name, counts in reasons.items():
+            self.reasons[name].update(counts)
+
+def percentile(values, q):
+    # Percentil por rango más cercano
+    ordered = sorted(values)
+    index = max(0, int(np.ceil(q / 100 * len(ordered))) - 1)
+    return ordered[index]
+
+def virtual_user(url, initial_props, waves, results, stop_at, args):
+    # Cada usuario repite la carga de la página; los callbacks de cada oleada se
+    # disparan en paralelo como en el navegador (máximo browser_connections a la vez)
+    with ThreadPoolExecutor(max_workers=args.browser_connections) as browser:
+        while time.time() < stop_at:
+            results.timed('GET /', request, url + '/')
+            results.timed('GET /_dash-layout', request, url + '/_dash-layout')
+            results.timed('GET /_dash-dependencies', request, url + '/_dash-dependencies')
+            props_by_id = {key: dict(props) for key, props in initial_props.items()}
+            for wave in waves:
+                futures = [
+                    browser.submit(results.timed, callback['name'], request, url + '/_dash-update-component',
+                                   build_payload(callback, props_by_id), args.request_timeout)
+                    for callback in wave
+                ]
+                for future in futures:
+                    apply_response(future.result(), props_by_id)
+
+def run_users(url, initial_props, waves, users, stop_at, args):
+    # Proceso cliente: ejecuta `users` usuarios virtuales y devuelve sus
+    # resultados junto con el tiempo de CPU consumido por el proceso
+    results = Results()
+    start_wall = time.time()
+    start_cpu = time.process_time()
+    threads = [
+        threading.Thread(target=virtual_user, args=(url, initial_props, waves, results, stop_at, args))
+        for _ in range(users)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    cpu_share = (time.process_time() - start_cpu) / max(time.time() - start_wall, 1e-9)
+    return results.state(), cpu_share
+
+def report(results, wall_time):
+    names = sorted(set(results.latencies) | set(results.errors))
+    width = max([len('Endpoint')] + [len(name) for name in names]) + 2
+    header = f"{'Endpoint':<{width}}{'req':>7}{'req/s':>9}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'error %':>9}"
+    lines = [header, '-' * len(header)]
+    for name in names:
+        latencies = results.latencies[name]
+        errors = results.errors[name]
+        total = len(latencies) + errors
+        if latencies:
+            p50, p95, p99 = (percentile(latencies, q) * 1000 for q in (50, 95, 99))
+        else:
+            p50 = p95 = p99 = float('nan')
+        lines.append(
+            f"{name:<{width}}{total:>7}{total / wall_time:>9.1f}{p50:>10.1f}{p95:>10.1f}{p99:>10.1f}{100 * errors / total:>9.2f}"
+        )
+
+    failed = [name for name in names if results.reasons[name]]
+    if failed:
+        lines.append('')
+        lines.append('Errores:')
+        for name in failed:
+            reasons = ', '.join(f'{reason} x{count}' for reason, count in results.reasons[name].most_common())
+            lines.append(f"  {name}: {reasons}")
+    return '\n'.join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de los callbacks de Dash")
+    parser.add_argument('--url', help="URL de un servidor ya iniciado (si no se indica se inicia gunicorn localmente)")
+    parser.add_argument('--users', type=int, default=8, help="usuarios concurrentes")
+    parser.add_argument('--duration', type=float, default=30, help="duración de la prueba en segundos")
+    parser.add_argument('--rows', type=int, default=250000, help="filas sintéticas")
+    parser.add_argument('--workers', type=int, default=1, help="workers de gunicorn")
+    parser.add_argument('--threads', type=int, default=8, help="threads por worker de gunicorn")
+    parser.add_argument('--processes', type=int, help="procesos cliente (por defecto uno por usuario)")
+    parser.add_argument('--browser-connections', type=int, default=6, help="peticiones simultáneas por usuario")
+    parser.add_argument('--request-timeout', type=float, default=120, help="timeout por petición en segundos")
+    parser.add_argument('--startup-timeout', type=float, default=300, help="tiempo máximo de arranque del servidor")
+    args = parser.parse_args()
+
+    process = None
+    url = args.url
+    if url is None:
+        process, url = start_server(args)
+    url = url.rstrip('/')
+
+    try:
+        initial_props, waves = load_callbacks(url)
+        for number, wave in enumerate(waves, 1):
+            print(f"Oleada {number}: {', '.join(callback['name'] for callback in wave)}")
+        print(f"Ejecutando {args.users} usuarios durante {args.duration:.0f} s...")
+
+        # Los usuarios se reparten en procesos para que el GIL del cliente, al
+        # leer y parsear las figuras, no infle las latencias medidas
+        processes = max(1, min(args.processes or args.users, args.users))
+        shares = [args.users // processes + (1 if index < args.users % processes else 0) for index in range(processes)]
+
+        results = Results()
+        start = time.time()
+        stop_at = start + args.duration
+        with ProcessPoolExecutor(max_workers=processes) as pool:
+            futures = [
+                pool.submit(run_users, url, initial_props, waves, users, stop_at, args)
+                for users in shares
+            ]
+            cpu_shares = []
+            for future in futures:
+                state, cpu_share = future.result()
+                results.merge(state)
+                cpu_shares.append(cpu_share)
+        wall_time = time.time() - start
+
+        print()
+        print(report(results, wall_time))
+
+        # Un proceso cliente cerca del 100% de CPU mide su propia contención, no la del servidor
+        if max(cpu_shares) > 0.8:
+            print(f"\nAdvertencia: un proceso cliente usó {max(cpu_shares):.0%} de CPU; "
+                  "las latencias p95/p99 pueden estar infladas por el cliente. "
+                  "Aumentar --processes o reducir --users.")
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+if __name__ == '__main__':
+    main()